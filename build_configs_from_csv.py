@@ -1,19 +1,56 @@
 import csv
 import json
 import os
-from urllib.parse import urlparse
-import requests
+import re
 
 from config import YOUTUBE_API_KEY  # your existing config.py
+from nim_core import build_http_session, json_dumps, json_loads
 
 
 CHANNELS_CSV_PATH = "channels.csv"
 KEYWORDS_CSV_PATH = "keywords.csv"
 CHANNELS_JSON_PATH = "channels.json"
 KEYWORDS_JSON_PATH = "keywords.json"
+CHANNEL_ID_CACHE_PATH = ".channel_id_cache.json"
 
+_SESSION = build_http_session()
 
-def resolve_channel_id_from_url(api_key: str, url: str) -> str | None:
+# Matches .../channel/UCxxxx and .../@handle (with or without a trailing
+# /videos etc.) in a single pass over the URL.
+_CHANNEL_URL_RE = re.compile(r"youtube\.com/(?:channel/(UC[\w-]+)|@([^/?#\s]+))")
+
+
+def _normalize_cache_key(value: str) -> str:
+    return value.strip().rstrip("/").lower()
+
+
+def load_channel_id_cache() -> dict:
+    """
+    Load previously resolved channel IDs from .channel_id_cache.json.
+    Keys are normalized channel URLs and @handles, values are channel IDs.
+    """
+    if not os.path.exists(CHANNEL_ID_CACHE_PATH):
+        return {}
+
+    try:
+        with open(CHANNEL_ID_CACHE_PATH, "rb") as f:
+            data = json_loads(f.read())
+            if isinstance(data, dict):
+                return data
+    except json.JSONDecodeError:
+        pass
+
+    return {}
+
+
+def save_channel_id_cache(cache: dict) -> None:
+    with open(CHANNEL_ID_CACHE_PATH, "wb") as f:
+        f.write(json_dumps(dict(sorted(cache.items())), indent=True))
+
+
+def resolve_channel_id_from_url(
+    api_key: str, url: str, cache: dict | None = None
+) -> str | None:
     """
     Try to extract or resolve a YouTube channel ID from a channel URL.
 
@@ -21,30 +58,30 @@ def resolve_channel_id_from_url(api_key: str, url: str) -> str | None:
       - https://www.youtube.com/channel/UCxxxx
       - https://www.youtube.com/@handle
       - Falls back to search if needed.
+
+    If a cache dict is given, handle and search lookups are answered from
+    it and new ones are added to it. /channel/ URLs need no lookup and are
+    never cached (their IDs are case-sensitive).
     """
     if not url:
         return None
 
-    parsed = urlparse(url)
-    path = parsed.path or ""
-
-    # Case 1: direct /channel/UCxxxxxx style
-    if "/channel/" in path:
-        parts = path.split("/channel/")
-        if len(parts) > 1:
-            candidate = parts[1].strip("/")
-            if candidate.startswith("UC"):
-                return candidate
-
-    # Case 2: handle style /@handle
-    # e.g. https://www.youtube.com/@hasanabi
     handle = None
-    if "/@" in path:
-        # path looks like /@hasanabi or /@hasanabi/videos
-        after = path.split("/@")[-1]
-        handle = "@" + after.split("/")[0]
+    m = _CHANNEL_URL_RE.search(url)
+    if m:
+        # Case 1: direct /channel/UCxxxxxx style
+        if m.group(1):
+            return m.group(1)
+
+        # Case 2: handle style /@handle
+        # e.g. https://www.youtube.com/@hasanabi or /@hasanabi/videos
+        handle = "@" + m.group(2)
 
     if handle:
+        handle_key = _normalize_cache_key(handle)
+        if cache is not None and handle_key in cache:
+            return cache[handle_key]
+
         # Use channels.list with forHandle
         url = "https://www.googleapis.com/youtube/v3/channels"
         params = {
@@ -52,15 +89,21 @@ def resolve_channel_id_from_url(api_key: str, url: str) -> str | None:
             "forHandle": handle,
             "key": api_key,
         }
-        r = requests.get(url, params=params)
+        r = _SESSION.get(url, params=params, timeout=10, stream=False)
         r.raise_for_status()
-        data = r.json()
+        data = json_loads(r.content)
         items = data.get("items", [])
         if items:
+            if cache is not None:
+                cache[handle_key] = items[0]["id"]
             return items[0]["id"]
 
     # Fallback: treat the URL as a search query to find the channel
     # This is less precise, but better than nothing for odd URLs.
+    url_key = _normalize_cache_key(url)
+    if cache is not None and url_key in cache:
+        return cache[url_key]
+
     search_url = "https://www.googleapis.com/youtube/v3/search"
     params = {
         "part": "snippet",
@@ -69,16 +112,60 @@ def resolve_channel_id_from_url(api_key: str, url: str) -> str | None:
         "maxResults": 1,
         "key": api_key,
     }
-    r = requests.get(search_url, params=params)
+    r = _SESSION.get(search_url, params=params, timeout=10, stream=False)
     r.raise_for_status()
-    data = r.json()
+    data = json_loads(r.content)
     items = data.get("items", [])
     if items:
+        if cache is not None:
+            cache[url_key] = items[0]["id"]["channelId"]
         return items[0]["id"]["channelId"]
 
     return None
 
 
+def _read_csv_header(reader) -> dict:
+    """
+    Consume the header row of a csv.reader and return {column_name: index},
+    so data rows can be read positionally instead of via DictReader.
+    """
+    header = next(reader, None) or []
+    return {name.strip(): i for i, name in enumerate(header)}
+
+
+def _cell(row: list, i: int | None) -> str:
+    # Missing columns / short rows read as "" (DictReader gave None here)
+    if i is None or i >= len(row):
+        return ""
+    return row[i].strip()
+
+
+def _write_json_array(path, entries) -> int:
+    """
+    Stream an iterable of dicts to path as a JSON array, one entry at a
+    time, formatted the same as json.dump(..., indent=2).
+    The file is written to a temp path and swapped in when complete.
+    Returns the number of entries written.
+    """
+    tmp_path = path + ".tmp"
+    count = 0
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            out.write("[")
+            for entry in entries:
+                out.write(",\n  " if count else "\n  ")
+                encoded = json_dumps(entry, indent=True).decode("utf-8")
+                out.write(encoded.replace("\n", "\n  "))
+                count += 1
+            out.write("\n]" if count else "]")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return count
+
+
 def build_channels_json_from_csv():
     if not YOUTUBE_API_KEY:
         raise RuntimeError("No YOUTUBE_API_KEY found in config.py")
@@ -87,21 +174,31 @@ def build_channels_json_from_csv():
         print(f"No {CHANNELS_CSV_PATH} file found. Skipping channels.")
         return
 
-    channels = []
-    with open(CHANNELS_CSV_PATH, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    cache = load_channel_id_cache()
+    cache_size = len(cache)
+
+    def iter_channels(reader):
+        idx = _read_csv_header(reader)
+        key_i, url_i = idx.get("key"), idx.get("url")
+        label_i, group_i = idx.get("label"), idx.get("group")
+
         for row in reader:
-            key = (row.get("key") or "").strip()
-            url = (row.get("url") or "").strip()
-            label = (row.get("label") or "").strip() or key
-            group = (row.get("group") or "").strip()
+            if not row:
+                continue  # blank line (DictReader skipped these too)
+
+            key = _cell(row, key_i)
+            url = _cell(row, url_i)
+            label = _cell(row, label_i) or key
+            group = _cell(row, group_i)
 
             if not key or not url:
                 print(f"Skipping row with missing key/url: {row}")
                 continue
 
             try:
-                channel_id = resolve_channel_id_from_url(YOUTUBE_API_KEY, url)
+                channel_id = resolve_channel_id_from_url(
+                    YOUTUBE_API_KEY, url, cache=cache
+                )
             except Exception as e:
                 print(f"Error resolving channel for {key} ({url}): {e}")
                 channel_id = None
@@ -110,17 +207,21 @@ def build_channels_json_from_csv():
                 print(f"Could not resolve channel ID for {key} ({url})")
                 continue
 
-            channels.append({
+            yield {
                 "key": key,
                 "channel_id": channel_id,
                 "label": label,
                 "group": group,
-            })
+            }
+
+    with open(CHANNELS_CSV_PATH, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        count = _write_json_array(CHANNELS_JSON_PATH, iter_channels(reader))
 
-    with open(CHANNELS_JSON_PATH, "w", encoding="utf-8") as out:
-        json.dump(channels, out, indent=2, ensure_ascii=False)
+    if len(cache) != cache_size:
+        save_channel_id_cache(cache)
 
-    print(f"Wrote {len(channels)} channels to {CHANNELS_JSON_PATH}")
+    print(f"Wrote {count} channels to {CHANNELS_JSON_PATH}")
 
 
 def build_keywords_json_from_csv():
@@ -128,14 +229,19 @@ def build_keywords_json_from_csv():
         print(f"No {KEYWORDS_CSV_PATH} file found. Skipping keywords.")
         return
 
-    keyword_entries = []
-    with open(KEYWORDS_CSV_PATH, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    def iter_keywords(reader):
+        idx = _read_csv_header(reader)
+        key_i, label_i = idx.get("key"), idx.get("label")
+        group_i, queries_i = idx.get("group"), idx.get("queries")
+
         for row in reader:
-            key = (row.get("key") or "").strip()
-            label = (row.get("label") or "").strip() or key
-            group = (row.get("group") or "").strip()
-            queries_raw = (row.get("queries") or "").strip()
+            if not row:
+                continue  # blank line (DictReader skipped these too)
+
+            key = _cell(row, key_i)
+            label = _cell(row, label_i) or key
+            group = _cell(row, group_i)
+            queries_raw = _cell(row, queries_i)
 
             if not key or not queries_raw:
                 print(f"Skipping row with missing key/queries: {row}")
@@ -144,17 +250,18 @@ def build_keywords_json_from_csv():
             # Split queries on ';'
             queries = [q.strip() for q in queries_raw.split(";") if q.strip()]
 
-            keyword_entries.append({
+            yield {
                 "key": key,
                 "label": label,
                 "group": group,
                 "queries": queries,
-            })
+            }
 
-    with open(KEYWORDS_JSON_PATH, "w", encoding="utf-8") as out:
-        json.dump(keyword_entries, out, indent=2, ensure_ascii=False)
+    with open(KEYWORDS_CSV_PATH, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        count = _write_json_array(KEYWORDS_JSON_PATH, iter_keywords(reader))
 
-    print(f"Wrote {len(keyword_entries)} keyword groups to {KEYWORDS_JSON_PATH}")
+    print(f"Wrote {count} keyword groups to {KEYWORDS_JSON_PATH}")
 
 
 if __name__ == "__main__":
@@ -1,7 +1,6 @@
 # nim_cli.py
-import json
-import os
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 
 from nim_core import (
     load_previous_data,
@@ -11,6 +10,8 @@ from nim_core import (
     get_top_videos_by_metric,
     fetch_current_snapshot_from_youtube,
     build_snapshot_from_channels_and_keywords,
+    get_last_option5_run,
+    set_last_option5_run,
 )
 
 # Original tracked videos list (for assignment / option 1 & 4)
@@ -28,25 +29,6 @@ TRACKED_VIDEOS = {
     # ... (rest of your fixed list – same as before)
 }
 
-LAST_RUN_FILE = "last_option5_run.json"
-
-
-def get_last_option5_run():
-    if not os.path.exists(LAST_RUN_FILE):
-        return None
-    try:
-        with open(LAST_RUN_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return datetime.fromisoformat(data.get("last_run"))
-    except Exception:
-        return None
-
-
-def set_last_option5_run():
-    now = datetime.now().isoformat(timespec="seconds")
-    with open(LAST_RUN_FILE, "w", encoding="utf-8") as f:
-        json.dump({"last_run": now}, f, indent=2)
-
 
 def fetch_current_data_for_all_videos_manual():
     """
@@ -102,13 +84,13 @@ def display_top_movers_grid(top_list, heading="TOP YOUTUBE MOVERS"):
 
         # First line: labels
         for item in row:
-            label = item["label"][:20]
+            label = item.label[:20]
             print(f"{label:<22}", end=" | ")
         print("")
 
         # Second line: deltas
         for item in row:
-            delta = item["delta"]
+            delta = item.delta
             print(f"Δ {delta:<18}", end=" | ")
         print("\n")
 
@@ -146,9 +128,13 @@ def main_menu():
                 input("Press ENTER to return to menu...")
             else:
                 # If snapshot already has deltas, use them; otherwise fall back to views.
-                metric = "views_delta_pct" if any(
-                    "views_delta_pct" in v for v in snapshot.get("videos", {}).values()
-                ) else "views"
+                has_deltas = snapshot.get("has_deltas")
+                if has_deltas is None:
+                    # Snapshot saved before the has_deltas flag existed
+                    has_deltas = any(
+                        "views_delta_pct" in v for v in snapshot.get("videos", {}).values()
+                    )
+                metric = "views_delta_pct" if has_deltas else "views"
                 top_list = get_top_videos_by_metric(snapshot, metric=metric, top_n=16)
                 display_top_movers_grid(top_list, heading="LAST SNAPSHOT")
 
@@ -169,13 +155,11 @@ def main_menu():
 
         elif choice == "5":
             last_run = get_last_option5_run()
-            if last_run is not None:
-                elapsed = datetime.now() - last_run
-                if elapsed < timedelta(minutes=1):
-                    print("\n[INFO] Option 5 was already run within the last 1 minute.")
-                    print("      Skipping to avoid burning YouTube API quota.")
-                    input("\nPress ENTER to return to menu...")
-                    continue
+            if last_run is not None and time.time() - last_run < 60:
+                print("\n[INFO] Option 5 was already run within the last 1 minute.")
+                print("      Skipping to avoid burning YouTube API quota.")
+                input("\nPress ENTER to return to menu...")
+                continue
 
             current_snapshot = build_snapshot_from_channels_and_keywords(
                 max_per_channel=5,
@@ -1,17 +1,180 @@
 # nim_core.py
+import gzip
+import heapq
 import json
 import os
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
 from datetime import datetime
-
-import requests
-from requests.exceptions import HTTPError
+from operator import itemgetter
 
 from config import YOUTUBE_API_KEY
 
+try:
+    import orjson  # optional: much faster JSON parse/emit than stdlib json
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack  # optional: compact binary snapshot storage
+except ImportError:
+    msgpack = None
+
+try:
+    import ijson  # optional: rank large JSON snapshots without loading them
+except ImportError:
+    ijson = None
+
 DATA_FILE_PATH = "youtube_metrics.json"
+MSGPACK_DATA_FILE_PATH = "youtube_metrics.msgpack"
+# "msgpack" (default, needs the msgpack package) or "json"
+SNAPSHOT_FORMAT = os.getenv("SNAPSHOT_FORMAT", "msgpack")
+# Gzip the saved snapshot (".gz" added to its name); "0" writes it plain
+SNAPSHOT_GZIP = os.getenv("SNAPSHOT_GZIP", "1") != "0"
 CHANNELS_CONFIG_PATH = "channels.json"
 KEYWORDS_CONFIG_PATH = "keywords.json"
+STATS_CACHE_PATH = ".stats_cache.json"
+LAST_RUN_FILE = ".last_option5_run"  # sentinel file, see get_last_option5_run
+STATS_CACHE_TTL_SECONDS = 60  # reuse video stats fetched within this window
 MIN_VIEWS_FOR_DISPLAY = 25000  # only show videos with at least this many views
+MAX_FETCH_WORKERS = 8  # concurrent YouTube API requests; keep modest for quota
+# Send If-None-Match with repeated API requests and reuse the stored body on
+# 304 Not Modified. Opt-in (YOUTUBE_ETAG_CACHE=1), since quota accounting
+# for conditional requests differs per endpoint.
+USE_API_ETAG_CACHE = os.getenv("YOUTUBE_ETAG_CACHE", "0") != "0"
+ETAG_CACHE_MAX_ENTRIES = 512  # oldest stored responses are dropped past this
+
+
+# ---------- JSON ----------
+
+def json_loads(data):
+    """
+    Parse JSON from bytes or str, using orjson when it is installed.
+    Both backends raise json.JSONDecodeError on bad input.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj, indent=False):
+    """
+    Serialize obj to UTF-8 encoded JSON bytes, using orjson when it is
+    installed. indent=True pretty-prints with 2 spaces like json.dump.
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        text = json.dumps(obj, indent=2, ensure_ascii=False)
+    else:
+        text = json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+    return text.encode("utf-8")
+
+
+# ---------- HTTP SESSION ----------
+
+def build_http_session():
+    """
+    Build a requests.Session that keeps TLS connections to googleapis.com
+    alive between calls and retries transient failures (429 / 5xx).
+    """
+    # Imported here so the dashboard's read path, which never calls the
+    # API, doesn't pay for loading requests/urllib3 at startup
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+        # Hand the last response back so raise_for_status() still raises
+        # HTTPError and the existing error reporting keeps working.
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.headers.update({"Connection": "keep-alive"})
+    return session
+
+
+# Shared API session, created by _http_session() on first use
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+# (url, params without the API key) -> (etag, raw response body), in
+# insertion order so the oldest entry is evicted first. Shared by the
+# fetch pool's threads, so only touched under _ETAG_CACHE_LOCK.
+_etag_cache = {}
+_ETAG_CACHE_LOCK = threading.Lock()
+
+
+def _http_session():
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            _SESSION = build_http_session()
+        return _SESSION
+
+
+def _api_get(url, params):
+    """
+    GET a YouTube Data API endpoint on the shared session and return the
+    parsed JSON body. Raises requests.HTTPError on error statuses.
+
+    With USE_API_ETAG_CACHE, a request that was made before in this process
+    carries the previous ETag in If-None-Match; a 304 reply is answered
+    from the stored body.
+    """
+    cache_key = None
+    cached = None
+    headers = None
+    if USE_API_ETAG_CACHE:
+        cache_key = (url, tuple(sorted(
+            (k, str(v)) for k, v in params.items() if k != "key"
+        )))
+        with _ETAG_CACHE_LOCK:
+            cached = _etag_cache.get(cache_key)
+        if cached is not None:
+            headers = {"If-None-Match": cached[0]}
+
+    resp = _http_session().get(
+        url, params=params, headers=headers, timeout=10, stream=False
+    )
+    if resp.status_code == 304 and cached is not None:
+        return json_loads(cached[1])
+
+    resp.raise_for_status()
+    etag = resp.headers.get("ETag")
+    if cache_key is not None and etag:
+        # Bounded: each day's videos.list ID batches differ, so without a cap
+        # a long-running web worker would keep every body forever
+        with _ETAG_CACHE_LOCK:
+            while len(_etag_cache) >= ETAG_CACHE_MAX_ENTRIES:
+                del _etag_cache[next(iter(_etag_cache))]
+            _etag_cache[cache_key] = (etag, resp.content)
+
+    return json_loads(resp.content)
+
+
+# YouTube Data API endpoints and the fixed part of each request's params
+_API_BASE = "https://www.googleapis.com/youtube/v3"
+_VIDEOS_URL = f"{_API_BASE}/videos"
+_CHANNELS_URL = f"{_API_BASE}/channels"
+_PLAYLIST_ITEMS_URL = f"{_API_BASE}/playlistItems"
+_SEARCH_URL = f"{_API_BASE}/search"
+
+_VIDEOS_PARAMS = {"part": "snippet,statistics"}
+_CHANNELS_PARAMS = {"part": "contentDetails", "maxResults": 50}
+_PLAYLIST_ITEMS_PARAMS = {"part": "contentDetails"}
+_SEARCH_PARAMS = {"part": "snippet", "order": "date", "type": "video"}
 
 
 # ---------- CONFIG LOADERS ----------
@@ -29,8 +192,8 @@ def load_channels_config():
         return []
 
     try:
-        with open(CHANNELS_CONFIG_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        with open(CHANNELS_CONFIG_PATH, "rb") as f:
+            data = json_loads(f.read())
             if isinstance(data, list):
                 return data
     except json.JSONDecodeError:
@@ -56,8 +219,8 @@ def load_keywords_config():
         return []
 
     try:
-        with open(KEYWORDS_CONFIG_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        with open(KEYWORDS_CONFIG_PATH, "rb") as f:
+            data = json_loads(f.read())
             if isinstance(data, list):
                 return data
     except json.JSONDecodeError:
@@ -68,31 +231,164 @@ def load_keywords_config():
 
 # ---------- FILE I/O ----------
 
+# Process umask (os.umask can only be read by setting it, so do it once)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def _atomic_write(path, payload):
+    """
+    Write bytes to path via a temp file in the same directory + os.replace,
+    so readers (and concurrent writers) never see a truncated/partial file.
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(path)}."
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        # mkstemp creates 0600; give the file the mode open() would have
+        os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _snapshot_files():
+    """
+    (format, path) pairs for the snapshot, in load order: the configured
+    SNAPSHOT_FORMAT first, then the other one so existing snapshots keep
+    loading after the format is switched. Each format is listed gzipped
+    and plain, in the order SNAPSHOT_GZIP prefers.
+    """
+    files = [("json", DATA_FILE_PATH)]
+    if msgpack is not None:
+        if SNAPSHOT_FORMAT == "msgpack":
+            files.insert(0, ("msgpack", MSGPACK_DATA_FILE_PATH))
+        else:
+            files.append(("msgpack", MSGPACK_DATA_FILE_PATH))
+
+    suffixes = (".gz", "") if SNAPSHOT_GZIP else ("", ".gz")
+    return [(fmt, path + suffix) for fmt, path in files for suffix in suffixes]
+
+
+def _open_snapshot(path):
+    """Open a snapshot file for binary reading, un-gzipping .gz files."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def snapshot_file_path():
+    """
+    Path of the snapshot file load_previous_data() will read, or None if
+    there is no saved snapshot yet.
+    """
+    for _fmt, path in _snapshot_files():
+        if os.path.exists(path):
+            return path
+    return None
+
+
 def load_previous_data():
     """
-    Load the last saved snapshot from youtube_metrics.json.
+    Load the last saved snapshot (youtube_metrics.msgpack or .json,
+    optionally gzipped).
     Returns a dict or None.
     """
-    if not os.path.exists(DATA_FILE_PATH):
+    for fmt, path in _snapshot_files():
+        if not os.path.exists(path):
+            continue
+
+        try:
+            with _open_snapshot(path) as f:
+                raw = f.read()
+            if fmt == "msgpack":
+                data = msgpack.unpackb(raw)
+            else:
+                data = json_loads(raw)
+        # json.JSONDecodeError / msgpack unpack errors / truncated gzip /
+        # bad gzip header / corrupt deflate data
+        except (ValueError, EOFError, gzip.BadGzipFile, zlib.error):
+            return None
+
+        if isinstance(data, dict):
+            return data
         return None
 
+    return None
+
+
+def save_current_data(current_snapshot):
+    """
+    Save the current snapshot in SNAPSHOT_FORMAT.
+    msgpack is several times smaller and faster to decode than JSON; JSON
+    is used when msgpack is not installed, written compactly since the
+    file is only read back by load_previous_data. With SNAPSHOT_GZIP the
+    bytes are gzipped once here, which shrinks the JSON form several times.
+    """
+    fmt, path = _snapshot_files()[0]
+    if fmt == "msgpack":
+        payload = msgpack.packb(current_snapshot)
+    else:
+        payload = json_dumps(current_snapshot)
+
+    if path.endswith(".gz"):
+        payload = gzip.compress(payload, compresslevel=6)
+
+    _atomic_write(path, payload)
+
+
+def load_stats_cache():
+    """
+    Load the video stats cache from .stats_cache.json.
+    Format: {video_id: {"t": fetched_at_epoch, "v": stats_dict}}
+    """
+    if not os.path.exists(STATS_CACHE_PATH):
+        return {}
+
     try:
-        with open(DATA_FILE_PATH, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        with open(STATS_CACHE_PATH, "rb") as f:
+            data = json_loads(f.read())
             if isinstance(data, dict):
                 return data
     except json.JSONDecodeError:
-        return None
+        pass
 
-    return None
+    return {}
 
 
-def save_current_data(current_snapshot):
+def save_stats_cache(cache):
+    """
+    Save the video stats cache, dropping entries that are already expired.
+    """
+    now = time.time()
+    fresh = {
+        vid: entry for vid, entry in cache.items()
+        if now - entry["t"] < STATS_CACHE_TTL_SECONDS
+    }
+    _atomic_write(STATS_CACHE_PATH, json_dumps(fresh))
+
+
+def get_last_option5_run():
     """
-    Save the current snapshot to youtube_metrics.json.
+    When the channels + keywords snapshot (CLI option 5 / web refresh) was
+    last built, as unix epoch seconds (float), or None if it never was.
+    Read from the mtime of the LAST_RUN_FILE sentinel: one stat() call,
+    no file read or parse; compare it against time.time().
     """
-    with open(DATA_FILE_PATH, "w", encoding="utf-8") as f:
-        json.dump(current_snapshot, f, indent=2)
+    try:
+        return os.stat(LAST_RUN_FILE).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def set_last_option5_run():
+    # Zero-byte sentinel; its mtime is the last run time
+    open(LAST_RUN_FILE, "a").close()
+    os.utime(LAST_RUN_FILE, None)
 
 
 # ---------- DELTAS & RANKING ----------
@@ -112,41 +408,43 @@ def compute_deltas_all(previous_snapshot, current_snapshot):
       }
     }
     """
+    prev_videos = {}
+    if previous_snapshot is not None:
+        prev_videos = previous_snapshot.get("videos", {})
+
     deltas = {"videos": {}}
+    for video_key, curr_metrics in current_snapshot.get("videos", {}).items():
+        deltas["videos"][video_key] = _video_deltas(
+            curr_metrics, prev_videos.get(video_key)
+        )
 
-    if previous_snapshot is None or "videos" not in previous_snapshot:
-        for video_key in current_snapshot.get("videos", {}):
-            deltas["videos"][video_key] = {
-                "views_delta": "N/A",
-                "likes_delta": "N/A",
-                "comments_delta": "N/A",
-                "subscribers_delta": "N/A",
-            }
-        return deltas
+    return deltas
 
-    prev_videos = previous_snapshot.get("videos", {})
 
-    for video_key, curr_metrics in current_snapshot.get("videos", {}).items():
-        if video_key in prev_videos:
-            prev_metrics = prev_videos[video_key]
-            deltas["videos"][video_key] = {
-                "views_delta": curr_metrics["views"] - prev_metrics["views"],
-                "likes_delta": curr_metrics["likes"] - prev_metrics["likes"],
-                "comments_delta": curr_metrics["comments"] - prev_metrics["comments"],
-                "subscribers_delta": (
-                    curr_metrics.get("subscribers", 0) -
-                    prev_metrics.get("subscribers", 0)
-                ),
-            }
-        else:
-            deltas["videos"][video_key] = {
-                "views_delta": "N/A",
-                "likes_delta": "N/A",
-                "comments_delta": "N/A",
-                "subscribers_delta": "N/A",
-            }
+_NA_DELTAS = {
+    "views_delta": "N/A",
+    "likes_delta": "N/A",
+    "comments_delta": "N/A",
+    "subscribers_delta": "N/A",
+}
 
-    return deltas
+
+def _video_deltas(curr_metrics, prev_metrics):
+    """
+    Raw metric deltas for one video; all "N/A" if it has no previous entry.
+    """
+    if prev_metrics is None:
+        return dict(_NA_DELTAS)
+
+    return {
+        "views_delta": curr_metrics["views"] - prev_metrics["views"],
+        "likes_delta": curr_metrics["likes"] - prev_metrics["likes"],
+        "comments_delta": curr_metrics["comments"] - prev_metrics["comments"],
+        "subscribers_delta": (
+            curr_metrics.get("subscribers", 0) -
+            prev_metrics.get("subscribers", 0)
+        ),
+    }
 
 
 def apply_deltas_to_snapshot(previous_snapshot, current_snapshot):
@@ -154,43 +452,56 @@ def apply_deltas_to_snapshot(previous_snapshot, current_snapshot):
     Injects delta metrics into current_snapshot["videos"][...]:
       - views_delta, likes_delta, comments_delta, subscribers_delta
       - views_delta_pct (percentage change vs previous views)
+    and sets current_snapshot["has_deltas"] = True.
+
+    Deltas are written straight into each video dict in a single pass,
+    without building the intermediate compute_deltas_all() structure.
 
     Returns the mutated current_snapshot.
     """
     if current_snapshot is None or "videos" not in current_snapshot:
         return current_snapshot
 
-    deltas = compute_deltas_all(previous_snapshot, current_snapshot)
+    prev_videos = {}
+    if previous_snapshot is not None:
+        prev_videos = previous_snapshot.get("videos", {})
 
-    for video_key, delta_vals in deltas["videos"].items():
-        cur = current_snapshot["videos"].get(video_key)
-        if cur is None:
-            continue
-
-        # Copy raw deltas into snapshot
-        for k, v in delta_vals.items():
-            cur[k] = v
+    for video_key, cur in current_snapshot["videos"].items():
+        prev = prev_videos.get(video_key)
+        cur.update(_video_deltas(cur, prev))
 
         # Compute % delta for views, if possible
-        views_delta = delta_vals.get("views_delta")
-        if isinstance(views_delta, int):
-            # Approx previous views
-            prev_views = cur["views"] - views_delta
-            if prev_views > 0:
-                pct = round((views_delta / prev_views) * 100.0, 2)
-            else:
-                pct = "N/A"
+        if prev is not None and prev["views"] > 0:
+            pct = round((cur["views_delta"] / prev["views"]) * 100.0, 2)
         else:
             pct = "N/A"
 
         cur["views_delta_pct"] = pct
 
+    # Lets readers pick a delta metric without scanning every video
+    current_snapshot["has_deltas"] = True
+
     return current_snapshot
 
 
+@dataclass(slots=True)
+class TopVideoRow:
+    """
+    One ranked video as returned by get_top_videos_by_metric.
+    delta holds the value of the metric the list was ranked by.
+    """
+    video_key: str
+    channel_name: str
+    video_id: str
+    label: str
+    current_value: int
+    delta: float
+
+
 def get_top_videos_by_metric(snapshot, metric="views_delta_pct", top_n=16):
     """
-    Sort videos in a snapshot by the given metric and return top N.
+    Sort videos in a snapshot by the given metric and return the top N
+    as a list of TopVideoRow.
 
     metric options:
       - "views_delta_pct" (default)
@@ -200,53 +511,237 @@ def get_top_videos_by_metric(snapshot, metric="views_delta_pct", top_n=16):
     Applies a global minimum view threshold (MIN_VIEWS_FOR_DISPLAY), so
     only videos with at least that many total views are considered.
     """
-    rows = []
     videos = snapshot.get("videos", {})
 
-    for video_key, metrics in videos.items():
-        views = metrics.get("views", 0)
+    def candidates():
+        for video_key, metrics in videos.items():
+            sort_value = _top_sort_value(metrics, metric)
+            if sort_value is not None:
+                yield sort_value, video_key, metrics
 
-        # Enforce minimum-views filter
-        if not isinstance(views, int) or views < MIN_VIEWS_FOR_DISPLAY:
-            continue
+    # Top N by chosen metric descending: O(N log top_n) heap instead of a
+    # full sort, and output rows are only built for the winners.
+    top = heapq.nlargest(top_n, candidates(), key=itemgetter(0))
 
-        label = metrics.get("label", video_key)
-        channel_name = metrics.get("channel_name", "")
-        video_id = metrics.get("video_id", "")
+    return [
+        _top_row(sort_value, video_key, metrics)
+        for sort_value, video_key, metrics in top
+    ]
 
-        # Decide what we use as sort value
-        if metric == "views":
-            sort_value = views
-            delta_display = sort_value
-        else:
-            sort_value = metrics.get(metric, "N/A")
-            if isinstance(sort_value, str):
-                # skip items without a real numeric delta (e.g. first snapshot)
-                continue
-            delta_display = sort_value
 
-        rows.append({
-            "video_key": video_key,
-            "channel_name": channel_name,
-            "video_id": video_id,
-            "label": label,
-            "current_value": views,
-            "delta": delta_display,
-        })
+def _top_sort_value(metrics, metric):
+    """
+    Value a video is ranked by for metric, or None if it doesn't qualify
+    (under MIN_VIEWS_FOR_DISPLAY, or no numeric delta yet).
+    """
+    views = metrics.get("views", 0)
+
+    # Enforce minimum-views filter
+    if not isinstance(views, int) or views < MIN_VIEWS_FOR_DISPLAY:
+        return None
+
+    # Decide what we use as sort value
+    if metric == "views":
+        return views
+
+    sort_value = metrics.get(metric, "N/A")
+    if isinstance(sort_value, str):
+        # skip items without a real numeric delta (e.g. first snapshot)
+        return None
+    return sort_value
+
+
+def _top_row(sort_value, video_key, metrics):
+    return TopVideoRow(
+        video_key=video_key,
+        channel_name=metrics.get("channel_name", ""),
+        video_id=metrics.get("video_id", ""),
+        label=metrics.get("label", video_key),
+        current_value=metrics["views"],
+        delta=sort_value,
+    )
+
+
+TOP_LIST_METRICS = ("views", "views_delta", "views_delta_pct")
+
+
+def compute_top_lists(snapshot, top_n=16):
+    """
+    Rank the snapshot once per metric in TOP_LIST_METRICS.
+    Returns {metric: [row dict, ...]} (TopVideoRow fields as plain dicts),
+    ready to be stored as snapshot["tops"] and saved with the snapshot.
+    """
+    return {
+        metric: [
+            asdict(row)
+            for row in get_top_videos_by_metric(snapshot, metric=metric, top_n=top_n)
+        ]
+        for metric in TOP_LIST_METRICS
+    }
+
+
+def _build_json_value(events, event, value):
+    """
+    Assemble the JSON value that starts with (event, value) from an
+    ijson.parse() stream, consuming events up to its end.
+    """
+    if event == "start_map":
+        result = {}
+        for _, event, key in events:
+            if event == "end_map":
+                return result
+            _, event, value = next(events)
+            result[key] = _build_json_value(events, event, value)
 
-    # Sort by chosen metric descending
-    rows.sort(key=lambda r: r["delta"], reverse=True)
+    if event == "start_array":
+        result = []
+        for _, event, value in events:
+            if event == "end_array":
+                return result
+            result.append(_build_json_value(events, event, value))
 
-    # Take top N
-    return rows[:top_n]
+    return value
 
 
+def stream_top_lists(path, top_n=16):
+    """
+    compute_top_lists() straight from a JSON snapshot file, plain or
+    gzipped (needs ijson), in a single streamed pass.
+    The stored snapshot["tops"] are used when present; refresh saves them
+    ahead of "videos", so reading stops there. Otherwise videos are parsed
+    one at a time and each metric keeps a bounded heap of its top_n, so
+    memory stays O(top_n) however big the file grows.
+    Returns (timestamp, tops); timestamp is None if there are no videos.
+    """
+    timestamp = None
+    stored_tops = None
+    has_videos = False
+    heaps = {metric: [] for metric in TOP_LIST_METRICS}
+    count = 0
+
+    with _open_snapshot(path) as f:
+        events = ijson.parse(f, use_float=True)
+        for prefix, event, value in events:
+            if prefix == "timestamp":
+                timestamp = value
+            elif prefix == "tops" and event == "start_map":
+                stored_tops = _build_json_value(events, event, value)
+            elif prefix == "videos" and event == "start_map":
+                if stored_tops is not None:
+                    # Already have the tops: only check the map isn't empty
+                    has_videos = next(events)[1] == "map_key"
+                    break
+
+                for _, event, video_key in events:
+                    if event == "end_map":
+                        break  # end of "videos"
+                    _, event, value = next(events)
+                    metrics = _build_json_value(events, event, value)
+                    has_videos = True
+                    count += 1
+                    for metric, heap in heaps.items():
+                        sort_value = _top_sort_value(metrics, metric)
+                        if sort_value is None:
+                            continue
+                        # -count: on ties the earlier video wins, as in nlargest()
+                        entry = (sort_value, -count, video_key, metrics)
+                        if len(heap) < top_n:
+                            heapq.heappush(heap, entry)
+                        elif entry > heap[0]:
+                            heapq.heapreplace(heap, entry)
+
+    if not has_videos:
+        return None, {metric: [] for metric in TOP_LIST_METRICS}
+    if stored_tops is not None:
+        return timestamp, stored_tops
+
+    tops = {
+        metric: [
+            asdict(_top_row(sort_value, video_key, metrics))
+            for sort_value, _, video_key, metrics in sorted(heap, reverse=True)
+        ]
+        for metric, heap in heaps.items()
+    }
+    return timestamp, tops
+
+
+def load_top_lists(top_n=16):
+    """
+    (timestamp, tops) for the saved snapshot, tops as in compute_top_lists(),
+    or None if there is no readable snapshot. The stored "tops" are used
+    when present and ranked here for snapshots saved without them; a JSON
+    snapshot is streamed with stream_top_lists() when ijson is installed,
+    anything else is loaded in full.
+    """
+    path = snapshot_file_path()
+    if path is None:
+        return None
+
+    if ijson is not None and path in (DATA_FILE_PATH, DATA_FILE_PATH + ".gz"):
+        try:
+            return stream_top_lists(path, top_n=top_n)
+        # Corrupt JSON / truncated or corrupt gzip, as in load_previous_data
+        except (ijson.JSONError, EOFError, gzip.BadGzipFile, zlib.error):
+            return None
+
+    snapshot = load_previous_data()
+    if snapshot is None:
+        return None
+    if not snapshot.get("videos"):
+        return None, {metric: [] for metric in TOP_LIST_METRICS}
+
+    tops = snapshot.get("tops") or compute_top_lists(snapshot, top_n=top_n)
+    return snapshot.get("timestamp"), tops
+
 
 # ---------- YOUTUBE API HELPERS ----------
 
+def _fetch_stats_batch(api_key, batch):
+    """
+    Fetch snippet + statistics for a single batch of up to 50 video IDs.
+    Returns a partial stats_by_id dict (empty if the request failed).
+    """
+    from requests.exceptions import HTTPError  # deferred like the session
+
+    params = {**_VIDEOS_PARAMS, "id": ",".join(batch), "key": api_key}
+
+    try:
+        data = _api_get(_VIDEOS_URL, params)
+    except HTTPError as e:
+        print("\n====================== API ERROR ======================")
+        print(f"Error fetching stats batch: {e}")
+        try:
+            print("YouTube response snippet:")
+            print(e.response.text[:500])
+        except Exception:
+            pass
+        print("Skipping this batch, other batches are kept...")
+        print("=======================================================\n")
+        return {}
+
+    stats_by_id = {}
+    for item in data.get("items", []):
+        vid = item["id"]
+        snippet = item.get("snippet", {})
+        stats = item.get("statistics", {})
+
+        stats_by_id[vid] = {
+            "title": snippet.get("title", ""),
+            "channel_title": snippet.get("channelTitle", ""),
+            "views": int(stats.get("viewCount", 0)),
+            "likes": int(stats.get("likeCount", 0)) if "likeCount" in stats else 0,
+            "comments": int(stats.get("commentCount", 0)) if "commentCount" in stats else 0,
+        }
+
+    return stats_by_id
+
+
 def fetch_youtube_stats_for_videos(api_key, video_ids):
     """
     Call the YouTube Data API to get stats for a list of video IDs.
+    Videos fetched within the last STATS_CACHE_TTL_SECONDS are served from
+    the on-disk stats cache; the rest are fetched in concurrent batches
+    of 50 IDs.
     Returns:
     {
       "video_id": {
@@ -262,86 +757,108 @@ def fetch_youtube_stats_for_videos(api_key, video_ids):
     if not api_key:
         raise RuntimeError("No API key found in config.py")
 
+    now = time.time()
+    cache = load_stats_cache()
+
     stats_by_id = {}
-    base_url = "https://www.googleapis.com/youtube/v3/videos"
+    stale_ids = []
+    for vid in video_ids:
+        entry = cache.get(vid)
+        if entry is not None and now - entry["t"] < STATS_CACHE_TTL_SECONDS:
+            stats_by_id[vid] = entry["v"]
+        else:
+            stale_ids.append(vid)
+
+    batches = [stale_ids[i:i + 50] for i in range(0, len(stale_ids), 50)]
+    if not batches:
+        return stats_by_id
+
+    fetched = {}
+    with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(batches))) as pool:
+        for batch_stats in pool.map(lambda b: _fetch_stats_batch(api_key, b), batches):
+            fetched.update(batch_stats)
+
+    if fetched:
+        for vid, stats in fetched.items():
+            cache[vid] = {"t": now, "v": stats}
+        save_stats_cache(cache)
+
+    stats_by_id.update(fetched)
+    return stats_by_id
+
+
+def fetch_uploads_playlist_ids_bulk(api_key, channel_ids):
+    """
+    Map channel IDs to their 'uploads' playlist IDs.
 
-    for i in range(0, len(video_ids), 50):
-        batch = video_ids[i:i + 50]
-        params = {
-            "part": "snippet,statistics",
+    Regular channel IDs ("UC" + 22 chars) have the uploads playlist
+    "UU" + the same 22 chars, so those need no API call at all. Anything
+    else is looked up via channels.list, 50 IDs per request; a failed
+    request only loses its own batch.
+    Channels that can't be resolved are left out of the result.
+    """
+    if not api_key:
+        raise RuntimeError("No API key found in config.py")
+
+    uploads_by_channel = {}
+    lookup_ids = []
+    for channel_id in channel_ids:
+        if channel_id.startswith("UC") and len(channel_id) == 24:
+            uploads_by_channel[channel_id] = "UU" + channel_id[2:]
+        else:
+            lookup_ids.append(channel_id)
+
+    for i in range(0, len(lookup_ids), 50):
+        batch = lookup_ids[i:i + 50]
+        chan_params = {
+            **_CHANNELS_PARAMS,
             "id": ",".join(batch),
             "key": api_key,
         }
-
         try:
-            resp = requests.get(base_url, params=params, timeout=10)
-            resp.raise_for_status()
-        except HTTPError as e:
-            print("\n====================== API ERROR ======================")
-            print(f"Error fetching stats batch: {e}")
-            try:
-                print("YouTube response snippet:")
-                print(resp.text[:500])
-            except Exception:
-                pass
-            print("Returning partial results so far...")
-            print("=======================================================\n")
-            return stats_by_id
-
-        data = resp.json()
+            data = _api_get(_CHANNELS_URL, chan_params)
+        except Exception as e:
+            print(f"Error resolving uploads playlists for {len(batch)} channels: {e}")
+            continue
+
         for item in data.get("items", []):
-            vid = item["id"]
-            snippet = item.get("snippet", {})
-            stats = item.get("statistics", {})
-
-            stats_by_id[vid] = {
-                "title": snippet.get("title", ""),
-                "channel_title": snippet.get("channelTitle", ""),
-                "views": int(stats.get("viewCount", 0)),
-                "likes": int(stats.get("likeCount", 0)) if "likeCount" in stats else 0,
-                "comments": int(stats.get("commentCount", 0)) if "commentCount" in stats else 0,
-            }
+            uploads = item["contentDetails"]["relatedPlaylists"]["uploads"]
+            uploads_by_channel[item["id"]] = uploads
 
-    return stats_by_id
+    return uploads_by_channel
 
 
-def fetch_latest_video_ids_for_channel_via_playlist(api_key, channel_id, max_results=5):
+def fetch_latest_video_ids_for_channel_via_playlist(
+    api_key, channel_id, max_results=5, uploads_playlist_id=None
+):
     """
     Get latest uploads for a channel via its 'uploads' playlist.
     Much cheaper than search.list in quota terms.
+
+    Pass uploads_playlist_id (see fetch_uploads_playlist_ids_bulk) to skip
+    resolving it here.
     """
     if not api_key:
         raise RuntimeError("No API key found in config.py")
 
     # 1) Get uploads playlist
-    channels_url = "https://www.googleapis.com/youtube/v3/channels"
-    chan_params = {
-        "part": "contentDetails",
-        "id": channel_id,
-        "key": api_key,
-    }
-    resp = requests.get(channels_url, params=chan_params, timeout=10)
-    resp.raise_for_status()
-    data = resp.json()
+    if uploads_playlist_id is None:
+        uploads_playlist_id = fetch_uploads_playlist_ids_bulk(
+            api_key, [channel_id]
+        ).get(channel_id)
 
-    items = data.get("items", [])
-    if not items:
+    if not uploads_playlist_id:
         print(f"[WARN] No channel found for id {channel_id}")
         return []
 
-    uploads_playlist_id = items[0]["contentDetails"]["relatedPlaylists"]["uploads"]
-
     # 2) Fetch recent items from uploads playlist
-    playlist_items_url = "https://www.googleapis.com/youtube/v3/playlistItems"
     pl_params = {
-        "part": "contentDetails",
+        **_PLAYLIST_ITEMS_PARAMS,
         "playlistId": uploads_playlist_id,
         "maxResults": max_results,
         "key": api_key,
     }
-    resp = requests.get(playlist_items_url, params=pl_params, timeout=10)
-    resp.raise_for_status()
-    pl_data = resp.json()
+    pl_data = _api_get(_PLAYLIST_ITEMS_URL, pl_params)
 
     video_ids = []
     for item in pl_data.get("items", []):
@@ -356,35 +873,32 @@ def fetch_video_ids_for_keyword(api_key, query, max_results=5):
     Use YouTube search.list to discover recent videos for a keyword.
     This is quota-heavier, so use sparingly.
     """
+    from requests.exceptions import HTTPError  # deferred like the session
+
     if not api_key:
         raise RuntimeError("No API key found in config.py")
 
-    base_url = "https://www.googleapis.com/youtube/v3/search"
     params = {
-        "part": "snippet",
+        **_SEARCH_PARAMS,
         "q": query,
-        "order": "date",
-        "type": "video",
         "maxResults": max_results,
         "key": api_key,
     }
 
     try:
-        resp = requests.get(base_url, params=params, timeout=10)
-        resp.raise_for_status()
+        data = _api_get(_SEARCH_URL, params)
     except HTTPError as e:
         print("\n====================== API ERROR ======================")
         print(f"Error fetching videos for keyword '{query}': {e}")
         try:
             print("YouTube response snippet:")
-            print(resp.text[:500])
+            print(e.response.text[:500])
         except Exception:
             pass
         print("Returning empty list for this keyword...")
         print("=======================================================\n")
         return []
 
-    data = resp.json()
     video_ids = []
     for item in data.get("items", []):
         vid = item["id"].get("videoId")
@@ -407,30 +921,29 @@ def fetch_current_snapshot_from_youtube(tracked_videos):
     video_ids = [meta["video_id"] for meta in tracked_videos.values()]
     stats_by_id = fetch_youtube_stats_for_videos(YOUTUBE_API_KEY, video_ids)
 
-    snapshot = {
-        "timestamp": datetime.now().isoformat(timespec="seconds"),
-        "videos": {}
-    }
-
-    for video_key, meta in tracked_videos.items():
-        vid = meta["video_id"]
-        s = stats_by_id.get(vid)
-        if s is None:
-            continue
-
-        label = meta.get("label", f"{s['channel_title']} – {s['title'][:50]}")
-
-        snapshot["videos"][video_key] = {
+    # One dict literal per video, with the missing-stats filter folded in
+    videos = {
+        video_key: {
             "channel_name": s["channel_title"] or meta["channel_name"],
-            "video_id": vid,
+            "video_id": meta["video_id"],
             "views": s["views"],
             "likes": s["likes"],
             "comments": s["comments"],
             "subscribers": 0,
-            "label": label,
+            "label": (
+                meta["label"] if "label" in meta
+                else f"{s['channel_title']} – {s['title'][:50]}"
+            ),
         }
+        for video_key, meta in tracked_videos.items()
+        for s in (stats_by_id.get(meta["video_id"]),)
+        if s is not None
+    }
 
-    return snapshot
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "videos": videos,
+    }
 
 
 def build_snapshot_from_channels_and_keywords(
@@ -448,60 +961,82 @@ def build_snapshot_from_channels_and_keywords(
     channels_cfg = load_channels_config()
     keywords_cfg = load_keywords_config()
 
-    all_video_ids = set()
-    video_meta_list = []
-
-    # ---- Channels via playlist ----
-    for ch in channels_cfg:
-        ch_key = ch.get("key", "channel")
-        ch_id = ch.get("channel_id")
-        ch_label = ch.get("label", ch_key)
+    # video_id -> source info of the first source that found it
+    video_meta = {}
 
-        if not ch_id:
-            continue
+    def fetch_channel(ch):
+        try:
+            return fetch_latest_video_ids_for_channel_via_playlist(
+                YOUTUBE_API_KEY,
+                ch["channel_id"],
+                max_results=max_per_channel,
+                # None (not resolved in bulk) makes it look the channel up itself
+                uploads_playlist_id=uploads_by_channel.get(ch["channel_id"]),
+            )
+        except Exception as e:
+            print(f"Error fetching channel {ch.get('key', 'channel')}: {e}")
+            return []
 
+    def fetch_query(q):
         try:
-            ids = fetch_latest_video_ids_for_channel_via_playlist(
-                YOUTUBE_API_KEY, ch_id, max_results=max_per_channel
+            return fetch_video_ids_for_keyword(
+                YOUTUBE_API_KEY, q, max_results=max_per_keyword
             )
         except Exception as e:
-            print(f"Error fetching channel {ch_key}: {e}")
-            continue
+            print(f"Error fetching keyword '{q}': {e}")
+            return []
+
+    channels_cfg = [ch for ch in channels_cfg if ch.get("channel_id")]
+    uploads_by_channel = fetch_uploads_playlist_ids_bulk(
+        YOUTUBE_API_KEY, [ch["channel_id"] for ch in channels_cfg]
+    )
+
+    # The same query can appear under several keyword groups (or twice in
+    # one); search.list costs 100 quota units, so run each query only once
+    # and share its results with every group that lists it.
+    keyword_tasks = []
+    unique_queries = {}
+    for kw in keywords_cfg:
+        for q in kw.get("queries", []):
+            norm_q = " ".join(q.lower().split())
+            if not norm_q:
+                continue
+            unique_queries.setdefault(norm_q, q)
+            keyword_tasks.append((kw, norm_q))
+
+    # pool.map submits every task up front, so channel and keyword requests
+    # are all in flight together on the shared keep-alive session. Results
+    # still come back in config order, so de-duplication below credits a
+    # video to the same source as a serial run would.
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS) as pool:
+        channel_futures = pool.map(fetch_channel, channels_cfg)
+        query_futures = pool.map(fetch_query, unique_queries.values())
+        channel_results = list(channel_futures)
+        query_results = dict(zip(unique_queries, query_futures))
+
+    # ---- Channels via playlist ----
+    for ch, ids in zip(channels_cfg, channel_results):
+        ch_key = ch.get("key", "channel")
+        ch_label = ch.get("label", ch_key)
 
         for vid in ids:
-            if vid not in all_video_ids:
-                all_video_ids.add(vid)
-                video_meta_list.append({
-                    "video_id": vid,
-                    "source_type": "channel",
-                    "source_key": ch_key,
-                    "source_label": ch_label,
-                })
+            video_meta.setdefault(vid, {
+                "source_type": "channel",
+                "source_key": ch_key,
+                "source_label": ch_label,
+            })
 
     # ---- Keywords via search.list ----
-    for kw in keywords_cfg:
+    for kw, norm_q in keyword_tasks:
         kw_key = kw.get("key", "keyword")
-        queries = kw.get("queries", [])
         kw_label = kw.get("label", kw_key)
 
-        for q in queries:
-            try:
-                ids = fetch_video_ids_for_keyword(
-                    YOUTUBE_API_KEY, q, max_results=max_per_keyword
-                )
-            except Exception as e:
-                print(f"Error fetching keyword '{q}': {e}")
-                continue
-
-            for vid in ids:
-                if vid not in all_video_ids:
-                    all_video_ids.add(vid)
-                    video_meta_list.append({
-                        "video_id": vid,
-                        "source_type": "keyword",
-                        "source_key": kw_key,
-                        "source_label": kw_label,
-                    })
+        for vid in query_results[norm_q]:
+            video_meta.setdefault(vid, {
+                "source_type": "keyword",
+                "source_key": kw_key,
+                "source_label": kw_label,
+            })
 
     # No videos? Return empty snapshot
     snapshot = {
@@ -509,34 +1044,28 @@ def build_snapshot_from_channels_and_keywords(
         "videos": {}
     }
 
-    if not all_video_ids:
+    if not video_meta:
         return snapshot
 
     # Fetch stats for all unique videos
-    all_video_ids_list = list(all_video_ids)
     stats_by_id = fetch_youtube_stats_for_videos(
         YOUTUBE_API_KEY,
-        all_video_ids_list,
+        list(video_meta),
     )
 
-    for meta in video_meta_list:
-        vid = meta["video_id"]
-        stats = stats_by_id.get(vid)
-        if not stats:
-            continue
-
-        source_key = meta["source_key"]
-        video_key = f"{meta['source_type']}_{source_key}_{vid}"
-        label = f"{meta['source_label']} – {stats['title'][:50]}"
-
-        snapshot["videos"][video_key] = {
+    snapshot["videos"] = {
+        f"{meta['source_type']}_{meta['source_key']}_{vid}": {
             "channel_name": stats["channel_title"],
             "video_id": vid,
             "views": stats["views"],
             "likes": stats["likes"],
             "comments": stats["comments"],
             "subscribers": 0,
-            "label": label,
+            "label": f"{meta['source_label']} – {stats['title'][:50]}",
         }
+        for vid, meta in video_meta.items()
+        for stats in (stats_by_id.get(vid),)
+        if stats
+    }
 
     return snapshot
@@ -0,0 +1,142 @@
+# nim_refresh_job.py
+import sys
+import time
+from datetime import datetime
+
+try:
+    import fcntl  # POSIX only; without it builds are not locked across processes
+except ImportError:
+    fcntl = None
+
+from nim_core import (
+    _atomic_write,
+    json_dumps,
+    json_loads,
+    load_previous_data,
+    save_current_data,
+    build_snapshot_from_channels_and_keywords,
+    apply_deltas_to_snapshot,
+    compute_top_lists,
+    get_last_option5_run,
+    set_last_option5_run,
+)
+
+REFRESH_LOCK_FILE = ".refresh.lock"
+# Status of the latest web-triggered build, shared by all gunicorn workers
+REFRESH_STATUS_FILE = ".refresh_status.json"
+
+
+def try_acquire_refresh_lock():
+    """
+    Take the cross-process refresh lock (flock on REFRESH_LOCK_FILE)
+    without blocking, so two workers/hits/jobs can't run quota-burning
+    builds at the same time. Returns the open lock file, which holds the
+    lock until closed, or None if another process holds it.
+    """
+    lock_file = open(REFRESH_LOCK_FILE, "a")
+    if fcntl is not None:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return None
+    return lock_file
+
+
+def write_refresh_status(status):
+    """
+    Record the latest build's status dict (with its task_id) in
+    REFRESH_STATUS_FILE. Only written while holding the refresh lock, and
+    swapped in whole, so readers never see a partial file.
+    """
+    _atomic_write(REFRESH_STATUS_FILE, json_dumps(status))
+
+
+def read_refresh_status():
+    """The dict last written by write_refresh_status(), or None."""
+    try:
+        with open(REFRESH_STATUS_FILE, "rb") as f:
+            status = json_loads(f.read())
+    except (FileNotFoundError, ValueError):
+        return None
+    return status if isinstance(status, dict) else None
+
+
+def recent_run_status():
+    """
+    The "skipped_recent" status dict if a snapshot was built within the
+    last 24 hours, else None. Check it while holding the refresh lock, so
+    a build that just finished elsewhere is seen.
+    """
+    last_run = get_last_option5_run()
+    if last_run is None:
+        return None
+
+    if time.time() - last_run >= 86400:  # 24 hours
+        return None
+
+    return {
+        "status": "skipped_recent",
+        "message": "Already refreshed within last 24 hours.",
+        "last_run": datetime.fromtimestamp(last_run).isoformat(timespec="seconds"),
+    }
+
+
+def build_and_save_snapshot():
+    """
+    Build a new snapshot from channels + keywords, diff it against the
+    saved one and save it (with its top lists and the last-run marker).
+    Returns a JSON-able status dict.
+    """
+    prev = load_previous_data()
+    current = build_snapshot_from_channels_and_keywords(
+        max_per_channel=5,
+        max_per_keyword=3,
+    )
+
+    if not current.get("videos"):
+        return {
+            "status": "error_no_videos",
+            "message": "No videos fetched (likely quota or config issue)."
+        }
+
+    current = apply_deltas_to_snapshot(prev, current)
+    # Saved ahead of "videos" so streaming readers can stop before them
+    current = {"tops": compute_top_lists(current, top_n=16), **current}
+    save_current_data(current)
+    set_last_option5_run()
+
+    return {
+        "status": "ok",
+        "timestamp": current.get("timestamp"),
+        "video_count": len(current["videos"]),
+    }
+
+
+def run_refresh_job():
+    """
+    Lock, 24h guard and build in one go, without going through the web
+    app's /refresh endpoint. For schedulers that run on the same disk as
+    the dashboard; a Render Cron Job gets its own filesystem, so there
+    refresh.py still triggers the build over HTTP.
+    """
+    lock_file = try_acquire_refresh_lock()
+    if lock_file is None:
+        return {
+            "status": "skipped_in_progress",
+            "message": "Another refresh is already building a snapshot.",
+        }
+
+    try:
+        return recent_run_status() or build_and_save_snapshot()
+    finally:
+        lock_file.close()  # releases the flock
+
+
+if __name__ == "__main__":
+    result = run_refresh_job()
+    print("Status:", result["status"])
+    if "message" in result:
+        print(result["message"])
+    if result["status"].startswith("error"):
+        sys.exit(1)
@@ -1,118 +1,331 @@
 # nim_web.py
+import hashlib
+import hmac
 import os
-import json
-from datetime import datetime, timedelta
+import threading
+import traceback
+import uuid
+from datetime import datetime
 
-from flask import Flask, render_template, request, jsonify, abort
+from flask import Flask, render_template, request, abort, make_response
+from flask_caching import Cache
+from flask_compress import Compress
 
-from nim_core import (
-    load_previous_data,
-    save_current_data,
-    build_snapshot_from_channels_and_keywords,
-    apply_deltas_to_snapshot,
-    get_top_videos_by_metric,
-)
+# Only the read path is imported up front; the refresh/build functions
+# (nim_refresh_job) are imported by the refresh endpoint on first use, to
+# keep cold starts short.
+from nim_core import _atomic_write, json_dumps, snapshot_file_path, load_top_lists
 
 app = Flask(__name__)
+# Unhandled errors become plain 500 responses instead of being re-raised
+# to the server (Flask propagates them by default under debug/testing)
+app.config["PROPAGATE_EXCEPTIONS"] = False
+Compress(app)  # gzip/br HTML + JSON responses for clients that accept it
+
+# Rendered dashboard pages only change when a refresh saves a new snapshot.
+# SimpleCache is per-process; with several gunicorn workers set
+# CACHE_TYPE=FileSystemCache so a refresh invalidates all of them.
+cache = Cache(app, config={
+    "CACHE_TYPE": os.getenv("CACHE_TYPE", "SimpleCache"),
+    "CACHE_DIR": os.getenv("CACHE_DIR", "/tmp/nimcache"),
+    "CACHE_DEFAULT_TIMEOUT": 3600,
+})
 
-LAST_RUN_FILE = "last_option5_run.json"
 REFRESH_TOKEN = os.getenv("REFRESH_TOKEN", "")
+_REFRESH_TOKEN_BYTES = REFRESH_TOKEN.encode("utf-8")
+REFRESH_ERROR_LOG = "refresh_errors.log"
+
+# ?mode= value -> snapshot top list shown for it
+MODE_METRICS = {
+    "pct": "views_delta_pct",
+    "delta": "views_delta",
+    "views": "views",
+}
+
+# Dashboard top lists, reused until the snapshot file on disk changes
+_snap_cache = {"key": None, "data": None}
+_snap_lock = threading.Lock()
 
+# Held for the whole of a background build, so a second hit in this
+# process can't start a parallel YouTube fetch. Other workers/processes
+# are kept out by the flock, and the build's status is shared with them
+# through nim_refresh_job.REFRESH_STATUS_FILE.
+_build_lock = threading.Lock()
 
-def get_last_option5_run():
-    if not os.path.exists(LAST_RUN_FILE):
+
+def _snapshot_key():
+    """(path, mtime_ns, size) of the snapshot on disk, or None if there is none."""
+    path = snapshot_file_path()
+    if path is None:
         return None
-    try:
-        with open(LAST_RUN_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return datetime.fromisoformat(data.get("last_run"))
-    except Exception:
+
+    st = os.stat(path)
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def _cached_top_lists():
+    """
+    load_top_lists(), but only re-read when the snapshot file's mtime/size
+    changed since the last call. Only the (timestamp, tops) view is kept,
+    not the whole parsed snapshot. Treat as read-only.
+    """
+    key = _snapshot_key()
+    if key is None:
         return None
 
+    with _snap_lock:
+        if _snap_cache["key"] != key:
+            _snap_cache.update(key=key, data=load_top_lists(top_n=16))
+        return _snap_cache["data"]
 
-def set_last_option5_run():
-    now = datetime.now().isoformat(timespec="seconds")
-    with open(LAST_RUN_FILE, "w", encoding="utf-8") as f:
-        json.dump({"last_run": now}, f, indent=2)
 
+def _static_page_path(mode):
+    return os.path.join(app.static_folder, f"dashboard-{mode}.html")
 
-@app.route("/")
-def index():
+
+def _render_dashboard(mode, top_lists):
     """
-    Main dashboard view.
-    Query param: mode = pct | delta | views
+    Render the dashboard with mode's top list, plus every mode's list
+    (as JSON for the page's script) so the mode links switch client-side.
     """
-    snapshot = load_previous_data()
-    mode = request.args.get("mode", "pct")
-
-    if snapshot is None or not snapshot.get("videos"):
-        top_list = []
+    if top_lists is None:
         last_updated = None
+        tops = {metric: [] for metric in MODE_METRICS.values()}
     else:
-        if mode == "views":
-            metric = "views"
-        elif mode == "delta":
-            metric = "views_delta"
-        else:
-            metric = "views_delta_pct"
+        last_updated, tops = top_lists
 
-        top_list = get_top_videos_by_metric(snapshot, metric=metric, top_n=16)
-        last_updated = snapshot.get("timestamp")
+    tops_by_mode = {m: tops[metric] for m, metric in MODE_METRICS.items()}
 
     return render_template(
         "dashboard.html",
-        top_list=top_list,
+        top_list=tops_by_mode.get(mode, tops_by_mode["pct"]),
+        tops=tops_by_mode,
         mode=mode,
         last_updated=last_updated,
     )
 
 
+def _prerender_dashboard():
+    """
+    Render the dashboard for every mode to static/dashboard-<mode>.html
+    after a refresh. index() serves these as-is, and a CDN/static host can
+    serve them straight from /static/ without touching Python at all.
+    """
+    top_lists = _cached_top_lists()
+    os.makedirs(app.static_folder, exist_ok=True)
+
+    with app.app_context():
+        for mode in MODE_METRICS:
+            html = _render_dashboard(mode, top_lists)
+            _atomic_write(_static_page_path(mode), html.encode("utf-8"))
+
+
+def _read_prerendered_page(mode):
+    """
+    The pre-rendered page for mode, or None if there is none or it is older
+    than the snapshot on disk (e.g. saved by nim_refresh_job.py).
+    """
+    snapshot_path = snapshot_file_path()
+    try:
+        page_mtime = os.stat(_static_page_path(mode)).st_mtime_ns
+        if snapshot_path and page_mtime < os.stat(snapshot_path).st_mtime_ns:
+            return None
+        with open(_static_page_path(mode), encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+@cache.memoize(timeout=3600)
+def _dashboard_page(mode, snapshot_key):
+    """
+    Dashboard HTML for mode, cached until the next refresh. snapshot_key
+    (see _snapshot_key) only keys the cache, so a snapshot saved outside
+    this process also gets fresh pages.
+    """
+    if mode in MODE_METRICS:
+        page = _read_prerendered_page(mode)
+        if page is not None:
+            return page
+
+    return _render_dashboard(mode, _cached_top_lists())
+
+
+@app.route("/")
+def index():
+    """
+    Main dashboard view.
+    Query param: mode = pct | delta | views
+    Carries an ETag and Last-Modified from the snapshot timestamp, so
+    repeat hits from open tabs and monitors get an empty 304 back.
+    """
+    mode = request.args.get("mode", "pct")
+    resp = make_response(_dashboard_page(mode, _snapshot_key()))
+
+    top_lists = _cached_top_lists()
+    last_updated = top_lists[0] if top_lists else None
+    if last_updated:
+        # Weak, so it stays the same under Flask-Compress's gzip/br encodings
+        etag = hashlib.md5(f"{last_updated}-{mode}".encode("utf-8")).hexdigest()
+        resp.set_etag(etag, weak=True)
+        resp.last_modified = datetime.fromisoformat(last_updated).astimezone()
+
+    resp.cache_control.public = True
+    resp.cache_control.max_age = 300
+    return resp.make_conditional(request)
+
+
+def ojson(d, status=200):
+    """
+    JSON response encoded with json_dumps() (orjson when installed),
+    skipping jsonify()'s stdlib encoder.
+    """
+    return app.response_class(json_dumps(d), status=status, mimetype="application/json")
+
+
+def _require_refresh_token(token):
+    if not REFRESH_TOKEN:
+        abort(500, description="REFRESH_TOKEN not configured on server.")
+
+    # Constant-time compare so response timing doesn't leak the token
+    if not hmac.compare_digest(token.encode("utf-8"), _REFRESH_TOKEN_BYTES):
+        abort(403, description="Invalid refresh token.")
+
+
+def _log_refresh_error(message):
+    """Append message and the current traceback to REFRESH_ERROR_LOG."""
+    with open(REFRESH_ERROR_LOG, "a", encoding="utf-8") as f:
+        f.write(f"[{datetime.now().isoformat(timespec='seconds')}] "
+                f"{message}\n{traceback.format_exc()}\n")
+
+
+def _build_and_save_snapshot():
+    """
+    build_and_save_snapshot() plus re-rendering the static dashboard pages
+    and dropping the cached ones rendered from the old snapshot. Runs on a
+    daemon thread, off the request thread.
+    """
+    from nim_refresh_job import build_and_save_snapshot
+
+    result = build_and_save_snapshot()
+    if result["status"] == "ok":
+        try:
+            _prerender_dashboard()
+        except Exception:
+            # The snapshot is saved; stale pages are skipped by
+            # _read_prerendered_page(), so just log it
+            _log_refresh_error("pre-rendering the dashboard failed")
+        cache.clear()
+    return result
+
+
+def _run_build(task_id):
+    """
+    _build_and_save_snapshot(), with failures turned into an "error"
+    status dict. Nobody is waiting on the request, so the traceback is
+    appended to REFRESH_ERROR_LOG.
+    """
+    try:
+        return _build_and_save_snapshot()
+    except Exception as e:
+        _log_refresh_error(f"refresh {task_id} failed")
+        return {"status": "error", "message": str(e)}
+
+
+def _in_progress_response():
+    from nim_refresh_job import read_refresh_status
+
+    status = read_refresh_status()
+    if status is not None and status.get("status") == "running":
+        # Started by this or another worker: poll that build's status
+        return ojson({
+            "status": "already_running",
+            "task_id": status.get("task_id"),
+        }, status=202)
+
+    return ojson({
+        "status": "skipped_in_progress",
+        "message": "Another refresh is already building a snapshot.",
+    })
+
+
 @app.route("/refresh/<token>", methods=["POST", "GET"])
 def refresh_snapshot(token):
     """
     Server-side snapshot builder, used by:
       - You (manual hit)
       - Render Cron Job (daily curl)
-    """
-    if not REFRESH_TOKEN:
-        abort(500, description="REFRESH_TOKEN not configured on server.")
+    (nim_refresh_job.py runs the same build without HTTP, where a
+    scheduler shares this app's disk.)
 
-    if token != REFRESH_TOKEN:
-        abort(403, description="Invalid refresh token.")
+    The build itself can take minutes of YouTube API calls, so it runs on
+    a daemon thread and this returns 202 with a task_id right away;
+    poll /refresh/<token>/status/<task_id> (on any worker) for the outcome.
+    """
+    _require_refresh_token(token)
 
-    # 24h guard
-    last_run = get_last_option5_run()
-    if last_run is not None:
-        elapsed = datetime.now() - last_run
-        if elapsed < timedelta(hours=24):
-            return jsonify({
-                "status": "skipped_recent",
-                "message": "Already refreshed within last 24 hours.",
-                "last_run": last_run.isoformat(timespec="seconds"),
-            })
-
-    # Build snapshot
-    prev = load_previous_data()
-    current = build_snapshot_from_channels_and_keywords(
-        max_per_channel=5,
-        max_per_keyword=3,
+    from nim_refresh_job import (
+        try_acquire_refresh_lock,
+        recent_run_status,
+        write_refresh_status,
     )
 
-    if not current.get("videos"):
-        return jsonify({
-            "status": "error_no_videos",
-            "message": "No videos fetched (likely quota or config issue)."
-        })
+    # A build is already running: don't start a second one
+    if not _build_lock.acquire(blocking=False):
+        return _in_progress_response()
 
-    current = apply_deltas_to_snapshot(prev, current)
-    save_current_data(current)
-    set_last_option5_run()
+    lock_file = try_acquire_refresh_lock()
+    if lock_file is None:
+        _build_lock.release()
+        return _in_progress_response()
 
-    return jsonify({
-        "status": "ok",
-        "timestamp": current.get("timestamp"),
-        "video_count": len(current["videos"]),
-    })
+    def _do_build():
+        try:
+            write_refresh_status({**_run_build(task_id), "task_id": task_id})
+        finally:
+            lock_file.close()  # releases the flock
+            _build_lock.release()
+
+    try:
+        # 24h guard (checked under the lock, so a build that just finished
+        # elsewhere is seen)
+        skipped = recent_run_status()
+        if skipped is not None:
+            lock_file.close()
+            _build_lock.release()
+            return ojson(skipped)
+
+        task_id = uuid.uuid4().hex
+        write_refresh_status({"status": "running", "task_id": task_id})
+        threading.Thread(target=_do_build, daemon=True).start()
+    except BaseException:
+        # No thread will release them: don't leave refreshes locked out
+        lock_file.close()
+        _build_lock.release()
+        raise
+
+    return ojson({"status": "started", "task_id": task_id}, status=202)
+
+
+@app.route("/refresh/<token>/status/<task_id>")
+def refresh_status(token, task_id):
+    """
+    Outcome of a build started by refresh_snapshot, read from the shared
+    status file so it answers the same on every worker. Only the latest
+    build is kept.
+    """
+    _require_refresh_token(token)
+
+    from nim_refresh_job import read_refresh_status
+
+    status = read_refresh_status()
+    if status is None or status.get("task_id") != task_id:
+        abort(404, description="Unknown task id.")
+
+    if status.get("status") == "error":
+        return ojson(status, status=500)
+
+    return ojson(status)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,8 @@
 # refresh_runner.py
-import requests
 import os
 
+import httpx
+
 # Render provides site URL via environment variables if needed
 BASE_URL = os.getenv("NIM_DASHBOARD_URL", "https://nim-dashboard.onrender.com")
 
@@ -14,7 +15,11 @@ url = f"{BASE_URL}/refresh/{REFRESH_TOKEN}"
 
 print(f"Calling refresh URL: {url}")
 
-resp = requests.get(url, timeout=600)
+# The server only starts the build and answers 202 right away, so there is
+# no need to wait on it. HTTP/2 is used when the server offers it.
+timeout = httpx.Timeout(10.0, read=30.0)
+with httpx.Client(http2=True, timeout=timeout) as client:
+    resp = client.get(url)
 
 print("Status:", resp.status_code)
 print("Response:", resp.text)